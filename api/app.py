@@ -1,13 +1,34 @@
 import os
+import time
 import logging
+import functools
+from operator import itemgetter
 from pathlib import Path
-from typing import List, Dict, Any
+from stat import S_ISDIR
+from typing import List, Dict, Any, Iterator, Tuple
 from datetime import datetime, timezone
 
+import orjson
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
-app = FastAPI(title="Mini GH Releases Mirror (filesystem)")
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson instead of the stdlib encoder."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            default=str,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z,
+        )
+
+
+app = FastAPI(
+    title="Mini GH Releases Mirror (filesystem)",
+    default_response_class=ORJSONResponse,
+)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -19,22 +40,32 @@ logger = logging.getLogger("uvicorn.error")
 RELEASES_ROOT = Path(os.getenv("RELEASES_ROOT", "/srv/releases")).resolve()
 RELEASE_BASE = os.getenv("RELEASE_BASE", "https://decky.mirror.example.com")
 
+# (owner, repo, tag) -> (tag dir st_mtime_ns, asset names, release JSON template)
+_RELEASE_CACHE: Dict[Tuple[str, str, str], Tuple[int, List[str], bytes]] = {}
+# Tag dirs modified more recently than this may still gain files within the
+# same mtime tick, so their templates are not cached yet
+_RACY_MTIME_NS = 2_000_000_000
+
 
+@functools.lru_cache(maxsize=4096)
 def repo_root(owner: str, repo: str) -> Path:
     """return /srv/releases/<owner>/<repo>"""
     return RELEASES_ROOT / owner / repo
 
 
+@functools.lru_cache(maxsize=4096)
 def releases_dir(owner: str, repo: str) -> Path:
     """return /srv/releases/<owner>/<repo>/releases"""
     return repo_root(owner, repo) / "releases"
 
 
+@functools.lru_cache(maxsize=4096)
 def downloads_dir(owner: str, repo: str) -> Path:
     """return /srv/releases/<owner>/<repo>/releases/download"""
     return releases_dir(owner, repo) / "download"
 
 
+@functools.lru_cache(maxsize=4096)
 def latest_download_dir(owner: str, repo: str) -> Path:
     """return /srv/releases/<owner>/<repo>/releases/latest/download"""
     return releases_dir(owner, repo) / "latest" / "download"
@@ -50,19 +81,23 @@ def ensure_repo_exists(owner: str, repo: str) -> None:
 def list_tags(owner: str, repo: str) -> List[str]:
     """
     /srv/releases/<owner>/<repo>/releases/download/<tag>/*
+
+    Not cached: the order depends on each tag dir's own mtime, which
+    changes when assets are written into it.
     """
     ddir = downloads_dir(owner, repo)
-    if not ddir.exists():
+    entries: List[Tuple[float, str]] = []
+    try:
+        with os.scandir(ddir) as it:
+            for entry in it:
+                if entry.is_dir():
+                    entries.append((entry.stat().st_mtime, entry.name))
+    except FileNotFoundError:
         return []
 
-    tags: List[str] = []
-    for p in ddir.iterdir():
-        if p.is_dir():
-            tags.append(p.name)
-
     # sort by mtime desc
-    tags.sort(key=lambda t: (ddir / t).stat().st_mtime, reverse=True)
-    return tags
+    entries.sort(key=itemgetter(0), reverse=True)
+    return [name for _, name in entries]
 
 
 def resolve_latest_tag(owner: str, repo: str) -> str:
@@ -85,56 +120,115 @@ def resolve_latest_tag(owner: str, repo: str) -> str:
     return tags[0]
 
 
-def build_asset_entry(owner: str, repo: str, tag: str, file_path: Path) -> Dict[str, Any]:
-    rel_url = f"{owner}/{repo}/releases/download/{tag}/{file_path.name}"
+def _json_literal(value: Any) -> bytes:
+    """JSON-encode a static value for embedding in a %-format template."""
+    return orjson.dumps(value).replace(b"%", b"%%")
+
+
+def download_url_prefix(owner: str, repo: str, tag: str) -> str:
+    """return <RELEASE_BASE>/<owner>/<repo>/releases/download/<tag>/"""
     if tag == "latest":
-        rel_url = rel_url.replace(f"download/{tag}", "{tag}/download")
-    return {
-        "name": file_path.name,
-        "size": file_path.stat().st_size,
-        "created_at": _ts_to_iso(file_path.stat().st_ctime),
-        "updated_at": _ts_to_iso(file_path.stat().st_mtime),
-        "browser_download_url": f"{RELEASE_BASE}/{rel_url}",
-        "content_type": "application/octet-stream",
-        "browser_download_url": f"{RELEASE_BASE}/{rel_url}",
-    }
-
-
-def make_release(owner: str, repo: str, tag: str) -> Dict[str, Any]:
+        return f"{RELEASE_BASE}/{owner}/{repo}/releases/latest/download/"
+    return f"{RELEASE_BASE}/{owner}/{repo}/releases/download/{tag}/"
+
+
+def build_asset_template(url_prefix: str, name: str) -> bytes:
+    """
+    Serialized asset entry with %d/%s placeholders for size, created_at
+    and updated_at; everything else is fixed for a given file name.
+    """
+    return (
+        b'{"name":%s,"size":%%d,"created_at":"%%s","updated_at":"%%s",'
+        b'"browser_download_url":%s,"content_type":"application/octet-stream"}'
+    ) % (_json_literal(name), _json_literal(url_prefix + name))
+
+
+def build_release_template(owner: str, repo: str, tag: str, names: List[str]) -> bytes:
+    head = _json_literal({"id": tag, "tag_name": tag, "name": tag, "prerelease": False})
+    url_prefix = download_url_prefix(owner, repo, tag)
+    assets = b",".join(build_asset_template(url_prefix, name) for name in names)
+    return head[:-1] + b',"assets":[' + assets + b"]}"
+
+
+def make_release(owner: str, repo: str, tag: str) -> bytes:
+    """
+    Serialized release for the tag.
+
+    The JSON template is cached per tag until the tag dir's mtime changes
+    (assets added, removed or renamed); only the per-file stat values are
+    filled in on each call. A dir modified within _RACY_MTIME_NS of now is
+    not cached, since a file added in the same mtime tick would go unseen.
+    """
     ddir = downloads_dir(owner, repo) / tag
 
-    if not ddir.exists() or not ddir.is_dir():
+    try:
+        dir_st = ddir.stat()
+    except OSError:
+        dir_st = None
+    if dir_st is None or not S_ISDIR(dir_st.st_mode):
         logger.warning("Release not found on disk: %s/%s tag=%s, %s",
                        owner, repo, tag, ddir)
         raise HTTPException(status_code=404, detail="release not found")
 
-    assets: List[Dict[str, Any]] = []
-
-    for item in sorted(ddir.iterdir()):
-        if item.is_file():
-            assets.append(build_asset_entry(owner, repo, tag, item))
-
-    return {
-        "id": tag,
-        "tag_name": tag,
-        "name": tag,
-        "prerelease": False,
-        "assets": assets
-    }
-
+    key = (owner, repo, tag)
+    cached = _RELEASE_CACHE.get(key)
+    if cached is None or cached[0] != dir_st.st_mtime_ns:
+        with os.scandir(ddir) as it:
+            names = sorted(e.name for e in it if e.is_file())
+        cached = (dir_st.st_mtime_ns, names,
+                  build_release_template(owner, repo, tag, names))
+        if time.time_ns() - dir_st.st_mtime_ns >= _RACY_MTIME_NS:
+            _RELEASE_CACHE[key] = cached
+        else:
+            _RELEASE_CACHE.pop(key, None)
+
+    _, names, template = cached
+    values: List[Any] = []
+    try:
+        for name in names:
+            st = os.stat(os.path.join(ddir, name))
+            values += (st.st_size,
+                       _ts_ns_to_iso(st.st_ctime_ns),
+                       _ts_ns_to_iso(st.st_mtime_ns))
+    except FileNotFoundError:
+        # asset removed since the template was built; rebuild it
+        _RELEASE_CACHE.pop(key, None)
+        return make_release(owner, repo, tag)
+
+    return template % tuple(values)
+
+
+def make_releases(owner: str, repo: str, tags: List[str]) -> Iterator[bytes]:
+    """
+    Yield the JSON array of releases one release at a time, so only a
+    single serialized release is held in memory while streaming.
+    """
+    yield b"["
+    sep = b""
+    for tag in tags:
+        try:
+            body = make_release(owner, repo, tag)
+        except HTTPException:
+            # tag dir removed since it was listed; the response has started
+            continue
+        yield sep + body
+        sep = b","
+    yield b"]"
 
-def make_releases(owner: str, repo: str, tags: List[str]) -> List[Dict[str, Any]]:
-    return [make_release(owner, repo, tag) for tag in tags]
 
-def _ts_to_iso(ts: float) -> str:
-    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+@functools.lru_cache(maxsize=65536)
+def _ts_ns_to_iso(ts_ns: int) -> bytes:
+    # file timestamps repeat across requests, so most calls are cache hits
+    sec, ns = divmod(ts_ns, 1_000_000_000)
+    # same float os.stat() reports as st_*time, so rounding is unchanged
+    return datetime.fromtimestamp(sec + ns * 1e-9, tz=timezone.utc).isoformat().encode()
 
 
 @app.get("/repos/{owner}/{repo}/releases/latest")
 def get_latest_release(owner: str, repo: str):
     ensure_repo_exists(owner, repo)
     tag = resolve_latest_tag(owner, repo)
-    return JSONResponse(make_release(owner, repo, tag))
+    return Response(make_release(owner, repo, tag), media_type="application/json")
 
 
 @app.get("/repos/{owner}/{repo}/releases/{tag}")
@@ -149,7 +243,7 @@ def get_release(owner: str, repo: str, tag: str):
     if tag == "latest":
         tag = resolve_latest_tag(owner, repo)
 
-    return JSONResponse(make_release(owner, repo, tag))
+    return Response(make_release(owner, repo, tag), media_type="application/json")
 
 
 @app.get("/repos/{owner}/{repo}/releases")
@@ -158,5 +252,5 @@ def list_releases(owner: str, repo: str):
     tags = list_tags(owner, repo)
     if not tags:
         raise HTTPException(status_code=404, detail="no releases found")
-    return JSONResponse(make_releases(owner, repo, tags))
+    return StreamingResponse(make_releases(owner, repo, tags), media_type="application/json")
 
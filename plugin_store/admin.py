@@ -1,8 +1,9 @@
 import os
-import json
+import hmac
+import orjson
 
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, status
 from sqlalchemy.orm import Session
 from models import Plugin, PluginVersion
 from database import get_db
@@ -10,6 +11,7 @@ from pydantic import BaseModel
 from typing import List, Optional
 
 ADMIN_TOKEN = os.getenv("PLUGIN_STORE_ADMIN_TOKEN")
+_ADMIN_TOKEN_BYTES = ADMIN_TOKEN.encode() if ADMIN_TOKEN else None
 
 class PluginDetail(BaseModel):
     id: int
@@ -64,13 +66,14 @@ def verify_admin_token(
     Client must send:
       X-Plugin-Store-Token: <value of PLUGIN_STORE_ADMIN_TOKEN>
     """
-    if not ADMIN_TOKEN:
+    if not _ADMIN_TOKEN_BYTES:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Service not configured properly.",
         )
 
-    if not token or token != ADMIN_TOKEN:
+    # constant-time compare so the token can't be guessed byte by byte
+    if not token or not hmac.compare_digest(token.encode(), _ADMIN_TOKEN_BYTES):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or missing admin token.",
@@ -94,7 +97,7 @@ async def admin_create_plugin(
         name=payload.name,
         author=payload.author,
         description=payload.description,
-        tags=json.dumps(payload.tags),
+        tags=orjson.dumps(payload.tags).decode(),
         visible=False,
         downloads=0,
         updates=0,
@@ -1,23 +1,54 @@
 import os
-import json
-import requests
+import time
+import asyncio
+import logging
+import httpx
+import orjson
 
 from pathlib import Path
 from fastapi import FastAPI, Depends, Query, status
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import List, Optional
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import or_, select, update
+from typing import Any, List, Optional
 from datetime import datetime
 
 from models import Plugin, PluginVersion
-from database import init_db, get_db
+from database import init_db, get_db, SessionLocal
 from admin import internal_router
 
 
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson instead of the stdlib encoder."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            default=str,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z,
+        )
+
+
+logger = logging.getLogger("uvicorn.error")
+
 ADMIN_TOKEN = os.getenv("PLUGIN_STORE_ADMIN_TOKEN", "")
-app = FastAPI()
+PLUGINS_DIR = Path("/srv/plugins")
+PLUGINS_FILE = PLUGINS_DIR / "plugins.json"
+# Seconds between syncs of plugins.json into the DB; 0 (or less) syncs on
+# every request, even if plugins.json is unchanged, unless a sync is running.
+SYNC_TTL = int(os.getenv("SYNC_TTL", "300"))
+
+_sync_lock = asyncio.Lock()
+_last_sync: Optional[float] = None
+_last_sync_mtime_ns: Optional[int] = None
+
+# Shared client so upstream fetches reuse connections; closed on shutdown.
+# httpx does not follow redirects unless asked to.
+_http_client = httpx.AsyncClient(timeout=15, follow_redirects=True)
+
+app = FastAPI(default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -31,31 +62,44 @@ app.include_router(internal_router)
 
 
 @app.on_event("startup")
-def on_startup():
-    """Initialize the database on startup."""
+async def on_startup():
+    """Initialize the database and start the background sync on startup."""
     init_db()
+    if SYNC_TTL > 0:
+        app.state.sync_task = asyncio.create_task(periodic_plugins_sync())
+
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    """Stop the background sync and close the upstream HTTP client."""
+    task = getattr(app.state, "sync_task", None)
+    if task is not None:
+        task.cancel()
+    await _http_client.aclose()
 
-def load_plugins_from_source() -> List[dict]:
+
+async def load_plugins_from_source() -> List[dict]:
     """Load plugins list from local JSON file, or fetch from upstream if missing."""
-    download_path = Path("/srv/plugins")
-    download_path.mkdir(parents=True, exist_ok=True)
+    PLUGINS_DIR.mkdir(parents=True, exist_ok=True)
 
-    target_file = download_path / "plugins.json"
+    target_file = PLUGINS_FILE
 
     if not target_file.exists():
         # First time: fetch from upstream
-        resp = requests.get("https://plugins.deckbrew.xyz/plugins", timeout=15)
+        resp = await _http_client.get("https://plugins.deckbrew.xyz/plugins")
         resp.raise_for_status()
-        target_file.write_text(resp.text, encoding="utf-8")
+        await asyncio.to_thread(target_file.write_bytes, resp.content)
+
+    return orjson.loads(await asyncio.to_thread(target_file.read_bytes))
 
-    with target_file.open("r", encoding="utf-8") as f:
-        plugins = json.load(f)
 
-    return plugins
+async def ensure_plugins_synced(db: Session) -> None:
+    """Load the upstream JSON and merge it into the local DB off the event loop."""
+    plugins_data = await load_plugins_from_source()
+    await asyncio.to_thread(merge_plugins, db, plugins_data)
 
 
-def ensure_plugins_synced(db: Session) -> None:
+def merge_plugins(db: Session, plugins_data: List[dict]) -> None:
     """
     Sync plugins from upstream JSON into the local DB.
 
@@ -65,18 +109,26 @@ def ensure_plugins_synced(db: Session) -> None:
         - If (name, hash) 不存在：新增，並填入 artifact（若有）。
         - 如果存在：更新下載/更新數、created、artifact（若有提供）。
     """
-    plugins_data = load_plugins_from_source()
+    # Load every known plugin (and its versions) up front instead of
+    # querying once per upstream item.
+    upstream_ids = [p["id"] for p in plugins_data if p.get("id") is not None]
+    existing_plugins: dict[int, Plugin] = {
+        p.upstream_id: p
+        for p in (
+            db.query(Plugin)
+            .options(selectinload(Plugin.versions))
+            .filter(Plugin.upstream_id.in_(upstream_ids))
+            .all()
+        )
+    }
 
     for plugin_item in plugins_data:
         upstream_id = plugin_item.get("id")
         if upstream_id is None:
             continue
 
-        plugin: Plugin | None = (
-            db.query(Plugin)
-            .filter(Plugin.upstream_id == upstream_id)
-            .first()
-        )
+        plugin: Plugin | None = existing_plugins.get(upstream_id)
+        existing_versions: dict[tuple[str, str], PluginVersion] = {}
 
         if plugin is None:
             plugin = Plugin(
@@ -84,7 +136,7 @@ def ensure_plugins_synced(db: Session) -> None:
                 name=plugin_item.get("name"),
                 author=plugin_item.get("author"),
                 description=plugin_item.get("description"),
-                tags=json.dumps(plugin_item.get("tags", [])),
+                tags=orjson.dumps(plugin_item.get("tags", [])).decode(),
                 visible=False,
                 image_url=plugin_item.get("image_url"),
                 downloads=plugin_item.get("downloads", 0),
@@ -94,11 +146,13 @@ def ensure_plugins_synced(db: Session) -> None:
             )
             db.add(plugin)
             db.flush()
+            existing_plugins[upstream_id] = plugin
         else:
             plugin.name = plugin_item.get("name", plugin.name)
             plugin.author = plugin_item.get("author", plugin.author)
             plugin.description = plugin_item.get("description", plugin.description)
-            plugin.tags = json.dumps(plugin_item.get("tags", json.loads(plugin.tags or "[]")))
+            if "tags" in plugin_item:
+                plugin.tags = orjson.dumps(plugin_item["tags"]).decode()
             plugin.image_url = plugin_item.get("image_url", plugin.image_url)
             plugin.downloads = plugin_item.get("downloads", plugin.downloads)
             plugin.updates = plugin_item.get("updates", plugin.updates)
@@ -109,9 +163,7 @@ def ensure_plugins_synced(db: Session) -> None:
             if updated:
                 plugin.updated = updated
 
-        existing_versions: dict[tuple[str, str], PluginVersion] = {
-            (v.name, v.hash): v for v in plugin.versions
-        }
+            existing_versions = {(v.name, v.hash): v for v in plugin.versions}
 
         for version_item in plugin_item.get("versions", []):
             v_name = version_item.get("name")
@@ -147,20 +199,73 @@ def ensure_plugins_synced(db: Session) -> None:
     db.commit()
 
 
+async def sync_plugins_if_stale(db: Session) -> None:
+    """
+    Run ensure_plugins_synced at most once per SYNC_TTL seconds, and only
+    when plugins.json has changed since the last sync (always, when
+    SYNC_TTL <= 0).
+
+    While another sync is running, callers keep serving what is already
+    in the DB, unless no sync has completed yet.
+    """
+    global _last_sync, _last_sync_mtime_ns
+
+    if _last_sync is not None and time.monotonic() - _last_sync < SYNC_TTL:
+        return
+
+    if _sync_lock.locked() and _last_sync is not None:
+        return
+
+    async with _sync_lock:
+        if _last_sync is not None and time.monotonic() - _last_sync < SYNC_TTL:
+            return
+
+        try:
+            mtime_ns = PLUGINS_FILE.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime_ns = None
+
+        if SYNC_TTL <= 0 or mtime_ns is None or mtime_ns != _last_sync_mtime_ns:
+            await ensure_plugins_synced(db)
+            # plugins.json is fetched by the sync if it was missing
+            mtime_ns = PLUGINS_FILE.stat().st_mtime_ns
+
+        _last_sync_mtime_ns = mtime_ns
+        _last_sync = time.monotonic()
+
+
+async def periodic_plugins_sync() -> None:
+    """Keep the DB in sync in the background so requests don't pay for it."""
+    while True:
+        db = SessionLocal()
+        try:
+            await sync_plugins_if_stale(db)
+        except Exception:
+            logger.exception("Background plugin sync failed")
+        finally:
+            db.close()
+        await asyncio.sleep(SYNC_TTL)
+
+
 def plugin_to_dict(plugin: Plugin) -> dict:
-    """Convert Plugin ORM object to dict compatible with Decky Loader."""
+    """
+    Convert Plugin ORM object to dict compatible with Decky Loader.
+
+    Datetimes are left as-is; ORJSONResponse renders them as UTC with a
+    trailing Z.
+    """
     return {
         "id": plugin.upstream_id or plugin.id,  # fallback to local id if no upstream id
         "name": plugin.name,
         "author": plugin.author,
         "description": plugin.description,
-        "tags": json.loads(plugin.tags) if plugin.tags else [],
+        "tags": orjson.loads(plugin.tags) if plugin.tags else [],
         "versions": [
             {
                 "name": v.name,
                 "hash": v.hash,
                 'artifact': v.artifact,
-                "created": v.created.isoformat().replace("+00:00", "Z") if v.created else None,
+                "created": v.created,
                 "downloads": v.downloads,
                 "updates": v.updates,
             }
@@ -170,8 +275,8 @@ def plugin_to_dict(plugin: Plugin) -> dict:
         "image_url": plugin.image_url,
         "downloads": plugin.downloads,
         "updates": plugin.updates,
-        "created": plugin.created.isoformat().replace("+00:00", "Z") if plugin.created else None,
-        "updated": plugin.updated.isoformat().replace("+00:00", "Z") if plugin.updated else None,
+        "created": plugin.created,
+        "updated": plugin.updated,
     }
 
 
@@ -243,9 +348,13 @@ async def index():
 async def get_plugins(query: Optional[str] = None,
                       db: Session = Depends(get_db)) -> List[dict]:
     """Endpoint to get the list of plugins, backed by SQLite."""
-    ensure_plugins_synced(db)
+    await sync_plugins_if_stale(db)
 
-    q = db.query(Plugin).filter(Plugin.visible)
+    q = (
+        db.query(Plugin)
+        .options(selectinload(Plugin.versions))
+        .filter(Plugin.visible)
+    )
 
     if query:
         like_pattern = f"%{query}%"
@@ -257,7 +366,9 @@ async def get_plugins(query: Optional[str] = None,
         )
 
     plugins = q.all()
-    return [plugin_to_dict(p) for p in plugins]
+    # plugin_to_dict only emits values orjson serializes natively, so hand
+    # back a rendered response and skip FastAPI's jsonable_encoder pass.
+    return ORJSONResponse([plugin_to_dict(p) for p in plugins])
 
 
 @app.post("/plugins/{plugin_name}/versions/{version_name}/increment")
@@ -276,30 +387,45 @@ async def increment_plugin_version_counter(
         - True  -> increment `updates`
         - False -> increment `downloads`
     """
-    plugin = db.query(Plugin).filter(Plugin.name == plugin_name).first()
-
-    if not plugin:
-        return {"error": "Plugin not found"}
-
-    version = (
-        db.query(PluginVersion)
-        .filter(
-            PluginVersion.plugin_id == plugin.id,
+    plugin_id = (
+        select(Plugin.id)
+        .where(Plugin.name == plugin_name)
+        .limit(1)
+        .scalar_subquery()
+    )
+    version_id = (
+        select(PluginVersion.id)
+        .where(
+            PluginVersion.plugin_id == plugin_id,
             PluginVersion.name == version_name,
         )
-        .first()
+        .limit(1)
+        .scalar_subquery()
     )
 
-    if not version:
-        return {"error": "Plugin version not found"}, status.HTTP_404_NOT_FOUND
+    # Bump the counters in SQL so concurrent requests can't lose updates.
+    version_col = PluginVersion.updates if isUpdate else PluginVersion.downloads
+    plugin_col = Plugin.updates if isUpdate else Plugin.downloads
 
-    if isUpdate:
-        version.updates += 1
-        plugin.updates += 1
-    else:
-        version.downloads += 1
-        plugin.downloads += 1
+    result = db.execute(
+        update(PluginVersion)
+        .where(PluginVersion.id == version_id)
+        .values({version_col: version_col + 1})
+        .execution_options(synchronize_session=False)
+    )
 
+    if result.rowcount == 0:
+        db.rollback()
+        if db.scalar(select(plugin_id)) is None:
+            return {"error": "Plugin not found"}
+        return {"error": "Plugin version not found"}, status.HTTP_404_NOT_FOUND
+
+    db.execute(
+        update(Plugin)
+        .where(Plugin.id == plugin_id)
+        .values({plugin_col: plugin_col + 1})
+        .execution_options(synchronize_session=False)
+    )
     db.commit()
 
     return {}
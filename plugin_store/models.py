@@ -6,6 +6,8 @@ from sqlalchemy import (
     DateTime,
     Text,
     ForeignKey,
+    Index,
+    text,
 )
 from sqlalchemy.orm import relationship
 
@@ -14,6 +16,10 @@ from database import Base
 
 class Plugin(Base):
     __tablename__ = "plugins"
+    __table_args__ = (
+        # partial index backing the public `visible` filter
+        Index("ix_plugins_visible_true", "id", sqlite_where=text("visible = 1")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     # Optional upstream id; you can use it to avoid duplicates when syncing
@@ -37,12 +43,14 @@ class Plugin(Base):
         "PluginVersion",
         back_populates="plugin",
         cascade="all, delete-orphan",
-        lazy="joined",
     )
 
 
 class PluginVersion(Base):
     __tablename__ = "plugin_versions"
+    __table_args__ = (
+        Index("ix_plugin_versions_plugin_name", "plugin_id", "name"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     plugin_id = Column(Integer, ForeignKey("plugins.id"), nullable=False)
@@ -31,8 +31,9 @@ fetch_and_build_cmd() {
 
   # parse_ss.py prints a single line: ss://method:pass@host:port|name
   # selection is controlled by NODE_NAME_REGEX / NODE_INDEX
-  SEL_LINE="$(python3 /app/parse_ss.py \
-      --subscription-b64 "$SUB_B64" \
+  # (subscription goes through stdin: large ones can exceed the argv limit)
+  SEL_LINE="$(printf '%s' "$SUB_B64" | python3 /app/parse_ss.py \
+      --subscription-b64 - \
       --name-regex "${NODE_NAME_REGEX:-}" \
       --index "${NODE_INDEX:-0}")" || {
     err "Failed to parse/select node from subscription."
@@ -1,125 +1,224 @@
 #!/usr/bin/env python3
 import argparse
-import base64
+import binascii
+import functools
 import re
+import string
 import sys
 import urllib.parse
 
 
-def b64decode_pad(s: str) -> bytes:
+# Missing base64 padding, indexed by len(s) & 3
+_PAD = (b"", b"===", b"==", b"=")
+# Map the URL-safe alphabet onto the standard one, so both decode the same
+_URLSAFE_TO_STD = bytes.maketrans(b"-_", b"+/")
+# Bytes urllib.parse.quote() leaves as-is with its default safe="/"
+_QUOTE_SAFE = frozenset((string.ascii_letters + string.digits + "_.-~/").encode())
+# str.translate() table percent-encoding every other byte (as a latin-1 char)
+_QUOTE_MAP = {b: f"%{b:02X}" for b in range(256) if b not in _QUOTE_SAFE}
+# The common "ss://userinfo@host:port#name" form, split in a single match.
+# A bracketed IPv6 host is captured without its brackets as "v6"; hosts with
+# stray brackets are left to the general path.
+_SS_RE = re.compile(
+    rb"ss://(?P<ui>[^@#]+)@(?:\[(?P<v6>[^\[\]/]+)\]|(?P<host>[^:#\[\]]+))"
+    rb":(?P<port>\d+)(?:#(?P<name>.*))?"
+)
+
+
+def b64decode_pad(s: str | bytes) -> bytes:
+    if isinstance(s, str):
+        s = s.encode("ascii")
+    elif not s.isascii():
+        raise ValueError("base64 input should contain only ASCII characters")
     # Add missing padding if necessary
-    pad = (-len(s)) % 4
-    return base64.urlsafe_b64decode(s + ("=" * pad))
+    data = s.translate(_URLSAFE_TO_STD) + _PAD[len(s) & 3]
+    # What base64.b64decode() does for bytes, minus its wrapper
+    return binascii.a2b_base64(data)
 
 
-def parse_line(line: str):
-    line = line.strip()
-    if not line or not line.startswith("ss://"):
-        return None
+def _check_utf8(b: bytes) -> bytes:
+    """Raise UnicodeDecodeError unless b is valid UTF-8; ASCII is checked in C."""
+    if not b.isascii():
+        b.decode("utf-8")
+    return b
 
-    uri = line
-    # Extract name tag if present
-    name = ""
-    if "#" in uri:
-        uri, frag = uri.split("#", 1)
-        name = urllib.parse.unquote(frag)
-
-    body = uri[len("ss://") :]
-    # Case 1: base64(method:pwd)@host:port
-    if "@" in body and not re.search(r"://", body):
-        userinfo, at_host = body.split("@", 1)
-        # userinfo could be "method:pwd" or BASE64(method:pwd)
-        try:
-            # try base64 first
-            up = b64decode_pad(userinfo).decode("utf-8")
-            if ":" in up:
-                method, pwd = up.split(":", 1)
-            else:
-                # If not "method:pwd", fallback to literal
-                raise ValueError
-        except Exception:
-            # fallback to literal userinfo
-            if ":" not in userinfo:
-                return None
-            method, pwd = userinfo.split(":", 1)
 
-        # host:port
-        if ":" not in at_host:
+def _quote(b: bytes) -> str:
+    """Same result as urllib.parse.quote(b), without its per-byte Python loop."""
+    return b.decode("latin-1").translate(_QUOTE_MAP)
+
+
+def _unquote(b: bytes) -> bytes:
+    """urllib.parse.unquote() of the UTF-8 text in b, back as UTF-8 bytes."""
+    if b"%" not in b:
+        return b
+    return urllib.parse.unquote(b.decode("utf-8", "ignore")).encode("utf-8")
+
+
+def _unquote_name(frag: bytes) -> str:
+    name = frag.decode("utf-8", "ignore")
+    return urllib.parse.unquote(name) if "%" in name else name
+
+
+def _split_userinfo(userinfo: bytes):
+    """Split b"method:pwd" or BASE64(method:pwd) into [method, pwd], or None."""
+    # ':' is not in the base64 alphabet, so this is literal userinfo
+    if b":" in userinfo:
+        return userinfo.split(b":", 1)
+    try:
+        up = _check_utf8(b64decode_pad(userinfo))
+    except ValueError:  # binascii.Error, UnicodeDecodeError
+        return None
+    if b":" not in up:
+        return None
+    return up.split(b":", 1)
+
+
+def parse_line(line: str | bytes):
+    """
+    Parse one subscription line into (ss_uri, name), or None if it isn't a
+    usable ss:// node. The line must already be stripped of surrounding
+    whitespace. It is handled as UTF-8 bytes throughout and only decoded
+    to str for the returned values.
+    """
+    if isinstance(line, str):
+        line = line.encode("utf-8")
+
+    m = _SS_RE.fullmatch(line)
+    if m is not None and b"://" not in m["ui"]:
+        # Fast path: Case 1 below, split up by a single regex match
+        userinfo, host, port, frag = m.group("ui", "host", "port", "name")
+        if host is None:
+            host = m["v6"]
+        cred = _split_userinfo(userinfo)
+        if cred is None:
             return None
-        host, port = at_host.rsplit(":", 1)
+        method, pwd = cred
+        name = "" if frag is None else _unquote_name(frag)
 
     else:
-        # Case 2: entire body is base64("method:pwd@host:port") — rare but seen
-        try:
-            decoded = b64decode_pad(body).decode("utf-8")
-        except Exception:
-            return None
-        # decoded like: method:pwd@host:port
-        if "@" not in decoded or ":" not in decoded:
+        uri = line.removeprefix(b"ss://")
+        if len(uri) == len(line):
             return None
 
-        try:
-            cred, at_host = decoded.split("@", 1)
-            if ":" not in cred:
-                cred = b64decode_pad(cred).decode("utf-8")
-            method, pwd = cred.split(":", 1)
-            host, port = at_host.rsplit(":", 1)
-        except ValueError:
-            print(f"Failed to parse decoded SS URI: {decoded}", file=sys.stderr)
-            return None
+        # Extract name tag if present
+        body, _, frag = uri.partition(b"#")
+        name = _unquote_name(frag)
 
-    method = urllib.parse.unquote(method)
-    pwd = urllib.parse.unquote(pwd)
-    host = host.strip("[]")  # allow IPv6 in brackets
+        # Case 1: base64(method:pwd)@host:port
+        if b"@" in body and b"://" not in body:
+            userinfo, at_host = body.split(b"@", 1)
+            # userinfo could be "method:pwd" or BASE64(method:pwd)
+            cred = _split_userinfo(userinfo)
+            if cred is None:
+                return None
+            method, pwd = cred
 
-    ss_uri = (
-        f"ss://{urllib.parse.quote(method)}:{urllib.parse.quote(pwd)}@{host}:{port}"
-    )
+            # host:port
+            i = at_host.rfind(b":")
+            if i < 0:
+                return None
+            host, port = at_host[:i], at_host[i + 1:]
+
+        else:
+            # Case 2: entire body is base64("method:pwd@host:port") — rare but seen
+            try:
+                decoded = _check_utf8(b64decode_pad(body))
+            except Exception:
+                return None
+            # decoded like: method:pwd@host:port
+            if b"@" not in decoded or b":" not in decoded:
+                return None
+
+            try:
+                cred, at_host = decoded.split(b"@", 1)
+                if b":" not in cred:
+                    cred = _check_utf8(b64decode_pad(cred))
+                method, pwd = cred.split(b":", 1)
+                host, port = at_host.rsplit(b":", 1)
+            except ValueError:
+                print(f"Failed to parse decoded SS URI: {decoded.decode('utf-8')}",
+                      file=sys.stderr)
+                return None
+
+        host = host.strip(b"[]")  # allow IPv6 in brackets
+
+    # Most credentials contain no escapes and nothing that needs quoting
+    method = _unquote(method)
+    pwd = _unquote(pwd)
+    method = method.decode("ascii") if _QUOTE_SAFE.issuperset(method) else _quote(method)
+    pwd = pwd.decode("ascii") if _QUOTE_SAFE.issuperset(pwd) else _quote(pwd)
+    host = host.decode("utf-8", "ignore")
+    port = port.decode("utf-8", "ignore")
+
+    ss_uri = f"ss://{method}:{pwd}@{host}:{port}"
     return ss_uri, (name or f"{host}:{port}")
 
 
-def main():
+@functools.lru_cache(maxsize=32)
+def _name_search(name_regex: str):
+    """Compiled .search of a --name-regex, reused across calls."""
+    return re.compile(name_regex).search
+
+
+def parse_subscription(sub_b64: str | bytes, name_regex: str = "", index: int = 0):
+    """
+    Decode a base64 subscription and select one node as (ss_uri, name).
+
+    Picks the first node whose name matches name_regex, else node[index]
+    (clamped to the last node). Returns None if there are no valid nodes.
+    """
+    # Subscription itself is base64 of a text with multiple lines of URLs (ss://...)
+    # Kept as bytes: parse_line only decodes the fields it returns
+    sub_raw = b64decode_pad(sub_b64)
+    lines = (s for s in (ln.strip() for ln in sub_raw.splitlines()) if s)
+
+    # Parse lazily: stop at the first regex match, or once the fallback
+    # index is reached when no regex is given
+    search = _name_search(name_regex) if name_regex else None
+    idx = max(index, 0)
+    fallback = None
+    seen = 0
+    for ln in lines:
+        if search is None and seen > idx:
+            break
+        node = parse_line(ln)
+        if not node:
+            continue
+        if search is not None and search(node[1]):
+            return node
+        if seen <= idx:
+            fallback = node
+            seen += 1
+    return fallback
+
+
+def _cli():
     ap = argparse.ArgumentParser(
         description="Parse base64 SS subscription and select one node"
     )
     ap.add_argument("--subscription-b64", required=True,
-                    help="The base64-encoded subscription content")
+                    help="The base64-encoded subscription content, "
+                         "or '-' to read it from stdin")
     ap.add_argument("--name-regex", default="",
                     help="Pick first node whose name matches this regex")
     ap.add_argument("--index", type=int, default=0,
                     help="Fallback index if regex not provided or not matched",)
     args = ap.parse_args()
 
-    # Subscription itself is base64 of a text with multiple lines of URLs (ss://...)
-    sub_raw = b64decode_pad(args.subscription_b64).decode("utf-8", errors="ignore")
-    lines = [ln for ln in sub_raw.splitlines() if ln.strip()]
+    sub_b64 = args.subscription_b64
+    if sub_b64 == "-":
+        # Raw bytes: no argv size limit and no str copy of the payload
+        sub_b64 = sys.stdin.buffer.read().strip()
 
-    nodes = []
-    for ln in lines:
-        parsed = parse_line(ln.strip())
-        if parsed:
-            nodes.append(parsed)
-
-    if not nodes:
+    selected = parse_subscription(sub_b64, args.name_regex, args.index)
+    if selected is None:
         print("No valid ss nodes found in subscription", file=sys.stderr)
         sys.exit(2)
 
-    selected = None
-    if args.name_regex:
-        pat = re.compile(args.name_regex)
-        for item in nodes:
-            if pat.search(item[1]):
-                selected = item
-                break
-
-    if selected is None:
-        idx = min(max(args.index, 0), len(nodes) - 1)
-        selected = nodes[idx]
-
     ss_uri, name = selected
     print(f"{ss_uri}|{name}")
 
 
 if __name__ == "__main__":
-    main()
-
+    _cli()